@@ -9,20 +9,66 @@ __version__ = "1.1.3"
 
 import configparser
 import json
+import mmap
+import os
 import re
 import sys
 import time
 import urllib.parse
 import zipfile
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import chain
+from operator import itemgetter
 from pathlib import Path
 
 import requests
+from requests.adapters import HTTPAdapter
 from rich.progress import Progress
+from urllib3.util.retry import Retry
+
+# Optional faster JSON backends, the standard library is used as a fallback
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import ujson
+except ImportError:
+    ujson = None
 
 MOD_API_BASE = "https://mods.vintagestory.at/api/mod/"
 MOD_DB_URL = "https://mods.vintagestory.at/show/mod/"
 MOD_DOWNLOAD_BASE = "https://moddbcdn.vintagestory.at/"
+API_CACHE_FILE = Path.home() / ".cache" / "vs_modlist" / "api.json"
+SCAN_CACHE_FILE = Path.home() / ".cache" / "vs_modlist" / "scan.json"
+
+# API info of each modid, kept across runs in API_CACHE_FILE:
+# {modid: {"assetid": ..., "side": ..., "mainfiles": {version: mainfile}, "etag": ..., "last_modified": ...}}
+_API_CACHE = {}
+
+# Shared HTTP session: keeps connections to the modDB alive across API calls
+_SESSION = requests.Session()
+_SESSION.headers.update({"User-Agent": f"VS_modsList_Creator/{__version__}"})
+# Read timeouts are not retried (read=False): a slow mod costs a single timeout, raised as is.
+_SESSION.mount('https://', HTTPAdapter(pool_connections=32, pool_maxsize=32,
+                                       max_retries=Retry(total=2, read=False, backoff_factor=0.3,
+                                                         status_forcelist=[502, 503, 504])))
+
+# Precompiled regexes used by fix_json and get_cs_info
+_FIX_JSON_RE = re.compile(r'^\s*//[^\n]*$|,(?:\s*\n[ \t]*//[^\n]*$)*\s*([}\]])', re.MULTILINE)
+_CS_INFO_RE = re.compile(rb'Version\s*=\s*"(?P<version>[^"]+)"'
+                         rb'|Side\s*=\s*"(?P<side>[^"]+)"'
+                         rb'|namespace\s+(?P<namespace>[A-Za-z0-9_]+)'
+                         rb'|Description\s*=\s*"(?P<description>[^"]+)"')
+
+
+def json_loads(data):
+    """Parses a JSON document (str or bytes) with the fastest available backend."""
+    if orjson:
+        return orjson.loads(data)
+    if ujson:
+        return ujson.loads(data)
+    return json.loads(data)
 
 
 def get_mod_path(config_file="config.ini"):
@@ -44,29 +90,32 @@ def get_mod_path(config_file="config.ini"):
 
 
 def sanitize_json_data(data):
-    """Recursively replace None values with empty strings."""
-    if isinstance(data, dict):
-        return {k: sanitize_json_data(v) for k, v in data.items()}
-    elif isinstance(data, list):
-        return [sanitize_json_data(item) for item in data]
-    elif data is None:
+    """Replace None values with empty strings, in place, and return the sanitized data."""
+    if data is None:
         return ""
+    stack = [data] if isinstance(data, (dict, list)) else []
+    while stack:
+        node = stack.pop()
+        for key, value in (node.items() if isinstance(node, dict) else enumerate(node)):
+            if value is None:
+                node[key] = ""
+            elif isinstance(value, (dict, list)):
+                stack.append(value)
     return data
 
 
 def fix_json(json_data):
     """Fix the JSON string by removing comments, trailing commas, and ignoring the 'website' key."""
 
-    # Remove single-line comments (lines starting with //)
-    json_data = re.sub(r'^\s*//[^\n]*$', '', json_data, flags=re.MULTILINE)
+    # Remove single-line comments (lines starting with //) and trailing commas before closing
+    # braces/brackets in a single pass. Only the captured closing brace/bracket is kept.
+    json_data = _FIX_JSON_RE.sub(lambda match: match.group(1) or '', json_data)
 
-    # Remove trailing commas before closing braces/brackets
-    json_data = re.sub(r',\s*([}\]])', r'\1', json_data)
-
-    # Try to load the JSON string into a Python dictionary
+    # Try to load the JSON string into a Python dictionary. The standard library is used on
+    # this robust path: it accepts NaN, Infinity and lone surrogates, which orjson rejects.
     try:
         data = json.loads(json_data)
-    except json.JSONDecodeError as e:
+    except ValueError as e:
         print(f"Error parsing JSON: {e}")
         return "Error: Invalid JSON data"
 
@@ -82,35 +131,30 @@ def fix_json(json_data):
     return json_data_fixed
 
 
-def is_zip_valid(zip_path):
-    """Checks if a zip file is valid and not corrupted."""
-    try:
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            zip_ref.testzip()  # Tests the integrity of the zip file
-        return True
-    except (zipfile.BadZipFile, zipfile.LargeZipFile):
-        return False
-
-
 def get_modinfo_from_zip(zip_path):
     """Gets modid, name, and version information from modinfo.json in a zip file."""
     try:
         with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            # Opens modinfo.json inside the zip file
-            if 'modinfo.json' not in zip_ref.namelist():
+            # Reads modinfo.json only, the rest of the archive is never decompressed
+            try:
+                raw_json = zip_ref.read('modinfo.json')
+            except KeyError:
                 print(f"Warning: No modinfo.json found in {zip_path}")
                 return None, None, None, None, None
-            with zip_ref.open('modinfo.json') as modinfo_file:
-                raw_json = modinfo_file.read().decode('utf-8-sig')
-                fixed_json = fix_json(raw_json)
-                modinfo = json.loads(fixed_json)
-                # Convert all keys to lowercase to ignore case
-                modinfo_lower = {k.lower(): v for k, v in modinfo.items()}
-                mod_url_api = f'{MOD_API_BASE}{modinfo_lower.get("modid")}'
-                return modinfo_lower.get('modid'), modinfo_lower.get('name'), modinfo_lower.get('version'), mod_url_api, modinfo_lower.get('description')
+        if raw_json.startswith(b'\xef\xbb\xbf'):
+            raw_json = raw_json[3:]  # Strip the UTF-8 BOM
+        try:
+            # Fast path: most modinfo.json files are already valid JSON, parsed from bytes.
+            modinfo = sanitize_json_data(json_loads(raw_json))
+        except ValueError:
+            modinfo = json.loads(fix_json(raw_json.decode('utf-8')))
+        # Convert all keys to lowercase to ignore case
+        modinfo_lower = {k.lower(): v for k, v in modinfo.items()}
+        mod_url_api = f'{MOD_API_BASE}{modinfo_lower.get("modid")}'
+        return modinfo_lower.get('modid'), modinfo_lower.get('name'), modinfo_lower.get('version'), mod_url_api, modinfo_lower.get('description')
     except zipfile.BadZipFile:
         print(f"Error: {zip_path} is not a valid zip file.")
-    except json.JSONDecodeError:
+    except ValueError:
         print(f"Error: Failed to parse modinfo.json in {zip_path}")
     except Exception as e:
         print(f"Unexpected error processing {zip_path}: {e}")
@@ -119,51 +163,47 @@ def get_modinfo_from_zip(zip_path):
 
 def get_cs_info(cs_path):
     """Gets Version, Side, namespace information from a .cs file."""
-    with open(cs_path, 'r', encoding='utf-8') as cs_file:
-        content = cs_file.read()
-        # Using regex to extract the values
-        version_match = re.search(r'Version\s*=\s*"([^"]+)"', content)
-        side_match = re.search(r'Side\s*=\s*"([^"]+)"', content)
-        namespace_match = re.search(r'namespace\s+([A-Za-z0-9_]+)', content)
-        description_match = re.search(r'Description\s*=\s*"([^"]+)"', content)
-        # If the information is found, return it
-        version = version_match.group(1) if version_match else None
-        side = side_match.group(1) if side_match else None
-        description = description_match.group(1) if description_match else None
-        namespace = namespace_match.group(1) if namespace_match else None
-        modid = namespace.lower().replace(" ", "") if namespace else None
-        mod_url_api = f'{MOD_API_BASE}{modid}'
-        return version, side, namespace, modid, mod_url_api, description
-
-
-def get_mainfile_for_version(mod_version, api_response):
+    cs_info = {}
+    with open(cs_path, 'rb') as cs_file:
+        # The file is scanned through a memory map, without reading it into a string: only the
+        # matched values are decoded. An empty file cannot be mapped and has nothing to find.
+        if os.fstat(cs_file.fileno()).st_size:
+            with mmap.mmap(cs_file.fileno(), 0, access=mmap.ACCESS_READ) as content:
+                # Using a single regex scan to extract the values, keeping the first match of each
+                for match in _CS_INFO_RE.finditer(content):
+                    if match.lastgroup not in cs_info:
+                        cs_info[match.lastgroup] = match.group(match.lastgroup).decode('utf-8', 'replace')
+                        if len(cs_info) == 4:
+                            break
+    # If the information is found, return it
+    version = cs_info.get('version')
+    side = cs_info.get('side')
+    description = cs_info.get('description')
+    namespace = cs_info.get('namespace')
+    modid = namespace.lower().replace(" ", "") if namespace else None
+    mod_url_api = f'{MOD_API_BASE}{modid}'
+    return version, side, namespace, modid, mod_url_api, description
+
+
+def get_mainfiles_by_version(releases):
     """
-    Retrieves the 'mainfile' link for the given version in modinfo and compares it with the versions in the API file.
+    Maps each mod version of the API releases to its 'mainfile' link.
 
-    mod_version: the mod version extracted from modinfo.json or a .cs file.
-    api_response: the API response containing the version information and 'mainfile'.
+    releases: the API response containing the version information and 'mainfile'.
 
-    Returns the link for the corresponding 'mainfile'.
+    If a version is listed several times, the first release is kept.
     """
-
-    for release in api_response:
-        modversion = release.get('modversion', [])
-        # Check if the modinfo version is in the tags
-        if mod_version == modversion:
-            return release.get('mainfile')
-
-    # If no match is found
-    print(f"No link found for version {mod_version}.")
-    return None
+    return {release['modversion']: release.get('mainfile')
+            for release in reversed(releases) if release.get('modversion')}
 
 
 def make_dl_link(mod_file_onlinepath_raw):
-    # URL parsing
-    parsed_url = urllib.parse.urlparse(mod_file_onlinepath_raw)
-    # Extracting the "path" (after the domain)
-    file_path = parsed_url.path
-    # Extracting parameters (query string)
-    params = parsed_url.query
+    # Extracting the "path" (after the domain) and the parameters (query string), without the
+    # fragment. The API links are always "https://<domain>/<path>?<query>": no full URL parsing.
+    link = mod_file_onlinepath_raw.partition('#')[0]
+    file_path, has_params, params = link.split('/', 3)[-1].partition('?')
+    if not has_params:
+        return f"{MOD_DOWNLOAD_BASE}{file_path}"
     # Encoding parameters to ensure they are valid in a URL
     encoded_params = urllib.parse.quote(params, safe="=&")
     # Reconstructing the final URL
@@ -171,26 +211,88 @@ def make_dl_link(mod_file_onlinepath_raw):
     return mod_file_onlinepath
 
 
-def get_api_info(modid):
-    """Gets, via the API, the assetid and download link for the file corresponding to the mod version."""
+def load_cache(cache_file):
+    """Loads the data cached on disk by a previous run, or returns an empty dict."""
+    try:
+        cache = json.loads(cache_file.read_bytes())
+    except (OSError, ValueError):
+        return {}  # No cache yet, or unreadable: everything is computed again.
+    # A cache written by another version of the tool, or not by the tool at all, is ignored.
+    if not isinstance(cache, dict) or cache.get("version") != __version__ \
+            or not isinstance(cache.get("data"), dict):
+        return {}
+    return cache["data"]
+
+
+def save_cache(cache_file, data):
+    """Stores a dict on disk for the next runs, tagged with the tool version."""
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        # The standard library also stores the values orjson cannot (NaN, lone surrogates).
+        cache_file.write_text(json.dumps({"version": __version__, "data": data}, indent=2), encoding='utf-8')
+    except OSError as e:
+        print(f"Warning: Unable to save the cache {cache_file}: {e}")
+
+
+def get_cached_api_info(modid, versions):
+    """Returns the cached API info of a mod if it knows all the given versions, otherwise None."""
+    cached = _API_CACHE.get(modid)
+    # The versions come from modinfo.json and are not always strings.
+    if cached and all(isinstance(version, str) and version in cached['mainfiles'] for version in versions):
+        return cached['assetid'], cached['side'], cached['mainfiles']
+    return None
+
+
+def get_api_info(modid, versions=()):
+    """
+    Gets, via the API, the assetid, the side and the download link of each version of the mod.
+
+    If the cache from a previous run already knows all the given local versions of the mod, it is
+    used without any request. Otherwise the cached ETag/Last-Modified are sent, and a 304 response
+    reuses the cache.
+    """
+    if versions:
+        cached_info = get_cached_api_info(modid, versions)
+        if cached_info:
+            return cached_info
+
+    cached = _API_CACHE.get(modid)
     url_api_mod = f"{MOD_API_BASE}{modid}"
+    # Conditional request: the server answers 304 without a body if the mod did not change.
+    headers = {}
+    if cached and cached.get('etag'):
+        headers['If-None-Match'] = cached['etag']
+    if cached and cached.get('last_modified'):
+        headers['If-Modified-Since'] = cached['last_modified']
     try:
-        response = requests.get(url_api_mod, timeout=5)
+        response = _SESSION.get(url_api_mod, headers=headers, timeout=5)
+        if response.status_code == 304:
+            # Not modified since the last run: reuse the cached info.
+            return cached['assetid'], cached['side'], cached['mainfiles']
         response.raise_for_status()
-        data = response.json()
+        data = json_loads(response.content)
         if not data.get("mod"):
             print(f"Mod ID {modid} not found on modDB.")
             return None, None, None
         mod_asset_id = data['mod']['assetid']
-        releases = data['mod']['releases']
+        mainfiles = get_mainfiles_by_version(data['mod']['releases'])
         side = data['mod']['side']
-        return mod_asset_id, side, releases
+        _API_CACHE[modid] = {
+            "assetid": mod_asset_id,
+            "side": side,
+            "mainfiles": mainfiles,
+            "etag": response.headers.get('ETag'),
+            "last_modified": response.headers.get('Last-Modified')
+        }
+        return mod_asset_id, side, mainfiles
     except requests.exceptions.Timeout:
         print(f"Timeout when fetching API info for {modid}")
     except requests.exceptions.HTTPError as err:
         print(f"HTTP error when fetching API info for {modid}: {err}")
     except requests.RequestException as err:
         print(f"Error fetching API info for {modid}: {err}")
+    except ValueError:
+        print(f"Invalid JSON received from the API for {modid}")
     except KeyError:
         print(f"Unexpected API response format for {modid}")
         return None, None, None
@@ -207,68 +309,64 @@ def save_json(data, filename):
         print(f"Unexpected error while saving {filename}: {e}")
 
 
-def process_mod_file(file, mods_data, invalid_files):
-    """Processes a mod file (zip or cs), adding the results to mods_data or invalid_files."""
-
-    if file.suffix == '.zip':
-        if is_zip_valid(file):
-            modid, name, version, mod_url_dl, description = get_modinfo_from_zip(file)
-            if modid and name and version:
-                assetid, side, releases = get_api_info(modid) or (None, None, [])
-
-                # Creation of the mod entry with basic information.
-                mod_entry = {
-                    "Name": name,
-                    "Version": version,
-                    "ModId": modid,
-                    "Description": description,
-                    "Side": "Unknown",
-                    "url_mod": "Local mod only",
-                    "url_download": "Local mod only"
-                }
-
-                if assetid:
-                    mod_file_onlinepath = get_mainfile_for_version(version, releases)
-                    if mod_file_onlinepath:
-                        mod_entry.update({
-                            "Side": side,
-                            "url_mod": f'{MOD_DB_URL}{assetid}',
-                            "url_download": mod_file_onlinepath
-                        })
-
-                mods_data["Mods"].append(mod_entry)
+def process_zip_file(file):
+    """
+    Reads the local information of a zip mod, without querying the API.
 
-            else:
-                invalid_files.append(file.name)  # Adds to invalid files if information is missing.
-        else:
-            invalid_files.append(file.name)  # Adds to invalid files if the zip is corrupted.
-
-    elif file.suffix == '.cs':
-        version, side, namespace, modid, mod_url_dl, description = get_cs_info(file)
-        if version and side and namespace and modid and mod_url_dl:
-            assetid, side, releases = get_api_info(modid) or (None, None, [])
-
-            # Creation of the mod entry with basic information.
-            mod_entry = {
-                "Name": namespace,
-                "Version": version,
-                "ModId": modid,
-                "Description": description
-            }
-
-            if assetid:
-                mod_file_onlinepath = get_mainfile_for_version(version, releases)
-                if mod_file_onlinepath:
-                    mod_entry.update({
-                        "Side": side,
-                        "url_mod": f'{MOD_DB_URL}{assetid}',
-                        "url_download": mod_file_onlinepath
-                    })
-
-            mods_data["Mods"].append(mod_entry)
+    Returns a tuple (mod_entry, invalid_file): the basic mod entry if the file is a valid mod,
+    otherwise the name of the invalid or corrupted file.
+    """
+    # Only modinfo.json is read: a corrupted zip is detected when opening it.
+    modid, name, version, mod_url_dl, description = get_modinfo_from_zip(file)
+    if modid and name and version:
+        # Creation of the mod entry with basic information.
+        mod_entry = {
+            "Name": name,
+            "Version": version,
+            "ModId": modid,
+            "Description": description,
+            "Side": "Unknown",
+            "url_mod": "Local mod only",
+            "url_download": "Local mod only"
+        }
+        return mod_entry, None
+    return None, file.name  # Invalid if information is missing or if the zip is corrupted.
+
+
+def process_cs_file(file):
+    """
+    Reads the local information of a .cs mod, without querying the API.
 
+    Returns a tuple (mod_entry, invalid_file): the basic mod entry if the file is a valid mod,
+    otherwise the name of the invalid file.
+    """
+    version, side, namespace, modid, mod_url_dl, description = get_cs_info(file)
+    if version and side and namespace and modid and mod_url_dl:
+        # Creation of the mod entry with basic information.
+        mod_entry = {
+            "Name": namespace,
+            "Version": version,
+            "ModId": modid,
+            "Description": description
+        }
+        return mod_entry, None
+    return None, file.name  # Invalid if information is missing.
+
+
+def add_api_info(mod_entry, api_info):
+    """Completes a mod entry with the side and links from the API, if its version is on the modDB."""
+    assetid, side, mainfiles = api_info
+    if assetid:
+        version = mod_entry["Version"]
+        mod_file_onlinepath = mainfiles.get(version) if isinstance(version, str) else None
+        if mod_file_onlinepath:
+            mod_entry.update({
+                "Side": side,
+                "url_mod": f'{MOD_DB_URL}{assetid}',
+                "url_download": mod_file_onlinepath
+            })
         else:
-            invalid_files.append(file.name)  # Adds to invalid files if information is missing.
+            print(f"No link found for version {mod_entry['Version']}.")
 
 
 def list_mods(mods_folder):
@@ -276,23 +374,82 @@ def list_mods(mods_folder):
     mods_data = {"Mods": []}
     invalid_files = []  # List of invalid or corrupted files.
 
-    mod_files = list(mods_folder.iterdir())
+    _API_CACHE.update(load_cache(API_CACHE_FILE))
+    # Mods read successfully by the previous run, keyed by file path, modification time and
+    # size: {key: mod_entry}. Invalid files are not cached and are read again on every run.
+    cached_files = load_cache(SCAN_CACHE_FILE)
+    scanned_files = {}
+
+    # Only the zip and cs files are mods, the other files and the folders are skipped. The folder
+    # is listed once with os.scandir, whose entries know their type without an extra stat call.
+    mod_files = []
+    with os.scandir(mods_folder) as entries:
+        for entry in entries:
+            if entry.name.endswith(('.zip', '.cs')) and entry.is_file():
+                stat = entry.stat()
+                mod_files.append((Path(entry.path), f"{entry.path}:{stat.st_mtime_ns}:{stat.st_size}"))
     total_files = len(mod_files)
     with Progress() as progress:
         task = progress.add_task("[cyan]Scanning mods...", total=total_files)
 
-        with ThreadPoolExecutor() as executor:
-            futures = []
-            for file in mods_folder.iterdir():
-                futures.append(
-                    executor.submit(process_mod_file, file, mods_data, invalid_files))
-
-            for idx, future in enumerate(as_completed(futures)):
-                future.result()  # Wait for completion and handle exceptions
+        api_task = progress.add_task("[cyan]Fetching modDB info...", total=0)
+
+        # Two pools: one reads the local files (disk and CPU bound), the other queries the API
+        # (network bound). Files unchanged since the last run reuse their cached result. Each
+        # new modid is sent to the API as soon as its file has been read. The workers only
+        # return their results, which are gathered by the main thread in the folder order to
+        # keep the output deterministic.
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as local_pool, \
+                ThreadPoolExecutor(max_workers=32) as api_pool:
+            futures = {}
+            reused_results = []
+            for idx, (file, file_key) in enumerate(mod_files):
+                cached_entry = cached_files.get(file_key)
+                if isinstance(cached_entry, dict) and {"ModId", "Version"} <= cached_entry.keys() \
+                        and isinstance(cached_entry.get("ModId"), (str, type(None))):
+                    reused_results.append((idx, (dict(cached_entry), None)))
+                else:
+                    process_file = process_zip_file if file.suffix == '.zip' else process_cs_file
+                    futures[local_pool.submit(process_file, file)] = idx
+            read_results = ((futures[future], future.result()) for future in as_completed(futures))
+
+            results = [None] * total_files
+            local_versions = {}  # Local versions of each modid.
+            api_futures = {}  # At most one API query per modid.
+            for idx, result in chain(reused_results, read_results):
+                mod_entry, invalid_file = results[idx] = result
+                if mod_entry:
+                    # Copy the entry before the API info is added to it.
+                    scanned_files[mod_files[idx][1]] = dict(mod_entry)
+                    modid = mod_entry["ModId"]
+                    local_versions.setdefault(modid, []).append(mod_entry["Version"])
+                    # The API is only queried if a local version of the mod is not in the cache.
+                    if modid not in api_futures and not get_cached_api_info(modid, [mod_entry["Version"]]):
+                        api_future = api_pool.submit(get_api_info, modid)
+                        api_future.add_done_callback(lambda f: progress.update(api_task, advance=1))
+                        api_futures[modid] = api_future
+                        progress.update(api_task, total=len(api_futures))
                 progress.update(task, advance=1)  # Update the progress bar after each file.
 
-    # Sort the mods by "Name".
-    mods_data["Mods"].sort(key=lambda mod: mod["ModId"].lower() if mod["ModId"] else "")
+            api_infos = {modid: (api_futures[modid].result() if modid in api_futures
+                                 else get_api_info(modid, versions)) or (None, None, {})
+                         for modid, versions in local_versions.items()}
+
+        for mod_entry, invalid_file in results:
+            if mod_entry:
+                mods_data["Mods"].append(mod_entry)
+            elif invalid_file:
+                invalid_files.append(invalid_file)
+
+    for mod_entry in mods_data["Mods"]:
+        add_api_info(mod_entry, api_infos[mod_entry["ModId"]])
+    save_cache(API_CACHE_FILE, _API_CACHE)
+    save_cache(SCAN_CACHE_FILE, scanned_files)
+
+    # Sort the mods by "ModId", with the lowercase keys computed once per mod.
+    keyed_mods = [((mod["ModId"] or "").lower(), mod) for mod in mods_data["Mods"]]
+    keyed_mods.sort(key=itemgetter(0))
+    mods_data["Mods"] = [mod for _, mod in keyed_mods]
 
     # Save datas in modlist.json
     filename = 'modlist.json'